@@ -6,14 +6,148 @@
         b) subclasses of `Relationship`.
 """
 
+import os
 import re
 import sys
+import time
+import threading
+import functools
 import logging as log
-from typing import List, Tuple, Union, Dict
+from typing import Iterator, List, Tuple, Union, Dict
 from datetime import datetime
-from py2neo import Graph, Node, NodeMatcher, Relationship, DatabaseError
+from py2neo import Graph, Node, Relationship, DatabaseError, Neo4jError
+from neo4j import Driver, GraphDatabase
+from neo4j.exceptions import ServiceUnavailable
 import numpy as np
 
+from numba_compat import njit
+
+
+# Connection details for the Neo4j graph database.
+NEO4J_URI = "bolt://localhost:7687"
+NEO4J_USER = "neo4j"
+NEO4J_PASSWORD = "test"
+
+# If the `USE_NEO4J_DRIVER` environment variable is set to `1`, `true` or `yes`
+# (in any case), read queries are run through the official `neo4j` driver (with
+# a pool of persistent Bolt connections) rather than py2neo.
+USE_NEO4J_DRIVER = os.getenv("USE_NEO4J_DRIVER", "").lower() in ("1", "true", "yes")
+NEO4J_MAX_CONNECTION_POOL_SIZE = 32
+
+# How long (in seconds) a distribution looked up from the graph database is
+# reused before it is fetched again.
+DISTRIBUTION_CACHE_TTL = 300
+
+# Uniqueness constraints created by `GraphInterface.create_schema()`, each
+# providing an index so that `Size` and `Industry` nodes are looked up by name
+# with an index seek. Where a constraint can't be created (e.g., because of
+# duplicate names, or on Neo4j versions older than
+# `SCHEMA_CONSTRAINTS_MIN_VERSION`), the plain index paired with it is created
+# instead.
+SCHEMA_CONSTRAINTS_MIN_VERSION = (4, 4)
+SCHEMA_CONSTRAINTS = [
+    (
+        "CREATE CONSTRAINT size_name IF NOT EXISTS "
+        "FOR (s:Size) REQUIRE s.name IS UNIQUE;",
+        "CREATE INDEX size_name IF NOT EXISTS FOR (s:Size) ON (s.name);",
+    ),
+    (
+        "CREATE CONSTRAINT industry_name IF NOT EXISTS "
+        "FOR (i:Industry) REQUIRE i.name IS UNIQUE;",
+        "CREATE INDEX industry_name IF NOT EXISTS FOR (i:Industry) ON (i.name);",
+    ),
+]
+
+SERVER_VERSION_QUERY = (
+    "CALL dbms.components() YIELD name, versions "
+    "WHERE name = 'Neo4j Kernel' RETURN versions[0];"
+)
+AWAIT_INDEXES_QUERY = "CALL db.awaitIndexes();"
+
+# Cypher queries used by `GraphInterface`. These are parameterised, rather than
+# built per call, so that Neo4j can reuse a single cached plan for each.
+SIZES_QUERY = "MATCH (s:Size) RETURN s.name AS name;"
+INDUSTRIES_QUERY = "MATCH (i:Industry) RETURN i.name AS name;"
+SIZES_AND_INDUSTRIES_QUERY = (
+    "MATCH (s:Size) RETURN 'Size' AS label, s.name AS name "
+    "UNION ALL "
+    "MATCH (i:Industry) RETURN 'Industry' AS label, i.name AS name;"
+)
+PROBABILITY_OF_BREACH_STATISTICS = {"probability": "probabilities"}
+PROBABILITY_OF_BREACH_QUERY = (
+    "UNWIND $pairs AS pair "
+    "OPTIONAL MATCH (s:Size {name: pair.size}) "
+    "OPTIONAL MATCH (s)<-[:FOR_SIZE]-(sp:IncidentProbability) "
+    "WITH pair, s, collect(sp.probability) AS size_probabilities "
+    "OPTIONAL MATCH (i:Industry {name: pair.industry}) "
+    "OPTIONAL MATCH (i)<-[:FOR_INDUSTRY]-(ip:IncidentProbability) "
+    "RETURN pair.size AS size, pair.industry AS industry, "
+    "s IS NOT NULL AS size_found, size_probabilities, "
+    "i IS NOT NULL AS industry_found, "
+    "collect(ip.probability) AS industry_probabilities;"
+)
+INCIDENT_COST_AVERAGES_STATISTICS = {"mean": "means", "median": "medians"}
+INCIDENT_COST_AVERAGES_QUERY = (
+    "UNWIND $pairs AS pair "
+    "OPTIONAL MATCH (s:Size {name: pair.size}) "
+    "OPTIONAL MATCH (s)<-[:FOR_SIZE]-(sa:IncidentCostAverages) "
+    "WITH pair, s, collect(sa.mean) AS size_means, "
+    "collect(sa.median) AS size_medians "
+    "OPTIONAL MATCH (i:Industry {name: pair.industry}) "
+    "OPTIONAL MATCH (i)<-[:FOR_INDUSTRY]-(ia:IncidentCostAverages) "
+    "RETURN pair.size AS size, pair.industry AS industry, "
+    "s IS NOT NULL AS size_found, size_means, size_medians, "
+    "i IS NOT NULL AS industry_found, "
+    "collect(ia.mean) AS industry_means, collect(ia.median) AS industry_medians;"
+)
+FREQUENCY_DISTRIBUTIONS_QUERY = (
+    "UNWIND $pairs AS pair "
+    "MATCH (:Size {name: pair.size})<-[:FOR_SIZE]-"
+    "(node:IncidentFrequencyDistribution)"
+    "-[:FOR_INDUSTRY]->(:Industry {name: pair.industry}) "
+    "RETURN pair.size AS size, pair.industry AS industry, node.a AS a, node.b AS b;"
+)
+COSTS_DISTRIBUTIONS_QUERY = (
+    "UNWIND $pairs AS pair "
+    "MATCH (:Size {name: pair.size})<-[:FOR_SIZE]-(node:IncidentCostsDistribution)"
+    "-[:FOR_INDUSTRY]->(:Industry {name: pair.industry}) "
+    "RETURN pair.size AS size, pair.industry AS industry, "
+    "node.mean AS mean, node.stddev AS stddev;"
+)
+CREATE_FREQUENCY_DISTRIBUTION_QUERY = (
+    "MATCH (s:Size {name: $size}), (i:Industry {name: $industry}) "
+    "CREATE (s)<-[:FOR_SIZE]-(node:IncidentFrequencyDistribution "
+    "{a: $a, b: $b, calculated_at: $calculated_at})-[:FOR_INDUSTRY]->(i) "
+    "RETURN node;"
+)
+CREATE_COSTS_DISTRIBUTION_QUERY = (
+    "MATCH (s:Size {name: $size}), (i:Industry {name: $industry}) "
+    "CREATE (s)<-[:FOR_SIZE]-(node:IncidentCostsDistribution "
+    "{mean: $mean, stddev: $stddev, calculated_at: $calculated_at})"
+    "-[:FOR_INDUSTRY]->(i) "
+    "RETURN node;"
+)
+DELETE_DISTRIBUTIONS_QUERY = (
+    "MATCH (n) "
+    "WHERE n:IncidentFrequencyDistribution OR n:IncidentCostsDistribution "
+    "DETACH DELETE n;"
+)
+
+
+@njit(cache=True, fastmath=True)
+def _rescale(
+    base_probabilities: np.ndarray, probability_of_breach: float
+) -> np.ndarray:
+    """
+    Rescales a set of base (i.e., >0) incident frequency probabilities as
+    proportions of a breach probability, prepending the probability of having
+    0 breaches.
+    """
+    rescaled = np.empty(base_probabilities.size + 1)
+    rescaled[0] = (100 - probability_of_breach) / 100
+    rescaled[1:] = (probability_of_breach * base_probabilities) / 100
+    return rescaled
+
 
 class GraphInterface:
     """
@@ -26,44 +160,134 @@ class GraphInterface:
     This class should:
         a) determine the correct transactions to use based on the called
            method and any arguments;
-        b) return only `Node`s, `Relationship`s, `SubGraph`s or lists thereof,
-           so that the values can be assigned to subclasses of those at the
-           point of calling; and
+        b) return only the property values needed by the caller, or `Node`s,
+           `Relationship`s, `SubGraph`s or lists thereof where the caller needs
+           the entities themselves; and
         c) deal with any `Exception`s, but not issues like returning 0 results,
            which should be dealt with at the point of calling.
     """
 
     g: Graph = None
+    driver: Driver = None
+
+    # Holds one driver session per thread, so that session set-up is only paid
+    # once per worker.
+    _sessions = threading.local()
+
+    # Caches for values that are effectively static for the lifetime of a
+    # process. Use `invalidate()` to flush them after a write.
+    _names_cache: Dict[str, List[str]] = {}
+    _distribution_cache: Dict[Tuple, Tuple[float, Dict[float, float]]] = {}
 
     @staticmethod
-    def __init__():
+    def connect() -> None:
+        """
+        Opens the connection to the Neo4j graph database, if it is not already
+        open. This is safe to call any number of times, and is called
+        automatically by the first query, so a process that never queries the
+        database never connects.
+        """
+        if GraphInterface.g is not None:
+            return
+
         try:
-            if GraphInterface.g is None:
-                GraphInterface.g = Graph(password="test")
-                log.info("Neo4j database connection opened successfully.")
-            else:
-                log.warning(
-                    "Neo4j database already connected - this branch "
-                    "shouldn't have been hit though!"
+            GraphInterface.g = Graph(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+            log.info("Neo4j database connection opened successfully.")
+
+            if USE_NEO4J_DRIVER:
+                GraphInterface.driver = GraphDatabase.driver(
+                    NEO4J_URI,
+                    auth=(NEO4J_USER, NEO4J_PASSWORD),
+                    max_connection_pool_size=NEO4J_MAX_CONNECTION_POOL_SIZE,
                 )
-        except DatabaseError:
+                GraphInterface.driver.verify_connectivity()
+                log.info("Neo4j driver connection pool opened successfully.")
+        except (DatabaseError, ServiceUnavailable):
             log.error("ERR: Neo4j database connection not successfully opened.")
             sys.exit()
 
+    @staticmethod
+    def _graph() -> Graph:
+        """Returns the py2neo `Graph`, connecting to it first if necessary."""
+        GraphInterface.connect()
+        return GraphInterface.g
+
+    @staticmethod
+    def create_schema() -> None:
+        """
+        Creates any missing schema constraints (or their fallback indexes) in
+        the Neo4j graph database, then waits for their indexes to come online.
+
+        This needs schema privileges, so it is left to the scripts that write to
+        the database rather than done on every connection.
+        """
+        graph = GraphInterface._graph()
+        version = graph.evaluate(SERVER_VERSION_QUERY)
+        supports_constraints = (
+            tuple(int(part) for part in re.match(r"(\d+)\.(\d+)", version).groups())
+            >= SCHEMA_CONSTRAINTS_MIN_VERSION
+        )
+        if not supports_constraints:
+            log.debug("Neo4j %s lacks constraint syntax, using indexes.", version)
+
+        for constraint, index in SCHEMA_CONSTRAINTS:
+            if not (
+                supports_constraints and GraphInterface._run_schema_query(constraint)
+            ):
+                GraphInterface._run_schema_query(index)
+
+        GraphInterface._run_schema_query(AWAIT_INDEXES_QUERY)
+
+    @staticmethod
+    def _run_schema_query(cypher: str) -> bool:
+        """
+        Runs a schema query, logging rather than raising any error reported by
+        Neo4j (e.g., a lack of privileges, or duplicate names preventing a
+        uniqueness constraint), and returns whether it succeeded.
+        """
+        try:
+            GraphInterface._graph().run(cypher)
+        except Neo4jError as err:
+            log.warning("Schema query '%s' failed: %s", cypher, str(err))
+            return False
+
+        return True
+
     @staticmethod
     def delete_distributions() -> bool:
         """Deletes any pre-existing distributions."""
-        GraphInterface.g.run(
-            "MATCH (n) "
-            "WHERE n:IncidentFrequencyDistribution OR n:IncidentCostsDistribution "
-            "DETACH DELETE n;"
+        GraphInterface._graph().run(DELETE_DISTRIBUTIONS_QUERY)
+        GraphInterface.invalidate(
+            "IncidentFrequencyDistribution", "IncidentCostsDistribution"
         )
         return True
 
+    @staticmethod
+    def invalidate(*labels) -> None:
+        """
+        Flushes any cached lookups for nodes with the given labels. Call with no
+        arguments to flush every cache.
+        """
+        labels = set(labels)
+
+        if not labels or labels.intersection(("Size", "Industry")):
+            GraphInterface._node_exists.cache_clear()
+
+        for label in list(GraphInterface._names_cache):
+            if not labels or label in labels:
+                del GraphInterface._names_cache[label]
+
+        for key in list(GraphInterface._distribution_cache):
+            if not labels or key[0] in labels:
+                del GraphInterface._distribution_cache[key]
+
+        if not labels or "IncidentBaseFrequencyProbabilities" in labels:
+            GraphInterface._get_base_frequency_probabilities.cache_clear()
+
     @staticmethod
     def get_incident_frequency_probabilities(
         boundaries, pairing: Tuple = ("All", "All")
-    ) -> List[float]:
+    ) -> np.ndarray:
         """
         Attempts to get a list of probabilities for different annual incident
         frequencies, specific to the organisational details provided.
@@ -76,50 +300,69 @@ class GraphInterface:
         Once the specific base (i.e., >0) probability is found, it then recalculates
         the overall set of probabilities as proportions of that base figure.
         """
-        size = pairing[0]
-        industry = pairing[1]
+        return GraphInterface.get_all_incident_frequency_probabilities(
+            boundaries, [pairing]
+        )[tuple(pairing)]
+
+    @staticmethod
+    def get_all_incident_frequency_probabilities(
+        boundaries, pairings
+    ) -> Dict[Tuple, Union[np.ndarray, None]]:
+        """
+        Equivalent to calling `get_incident_frequency_probabilities()` for each
+        of the given pairings, but looks up the breach probabilities for all of
+        them in a single query. Returns the probabilities keyed by pairing.
+        """
+        pairs = [{"size": size, "industry": industry} for size, industry in pairings]
 
         log.info(
-            "Attempting to get breach frequency probabilities specific to ('%s', '%s')...",
-            size,
-            industry,
+            "Attempting to get breach frequency probabilities for %d pairings...",
+            len(pairs),
         )
 
-        base_frequency_probabilities_nodes = GraphInterface._get_nodes(
-            "IncidentBaseFrequencyProbabilities"
+        base_frequency_probabilities = GraphInterface._get_base_frequency_probabilities(
+            len(boundaries) - 1
         )
-        base_frequency_probabilities = [
-            node["probabilities"]
-            for node in base_frequency_probabilities_nodes
-            if len(node["probabilities"]) == (len(boundaries) - 1)
-        ]
+        if base_frequency_probabilities is None:
+            return {(pair["size"], pair["industry"]): None for pair in pairs}
+
+        frequency_probabilities = {}
+        for result in GraphInterface._stream(PROBABILITY_OF_BREACH_QUERY, pairs=pairs):
+            pairing = (result["size"], result["industry"])
+            probability_of_breach = GraphInterface._combine_averages(
+                result, *pairing, PROBABILITY_OF_BREACH_STATISTICS
+            )
+            probabilities = GraphInterface._get_breach_frequency_probabilities(
+                boundaries,
+                base_frequency_probabilities,
+                probability_of_breach and probability_of_breach[0],
+                pairing,
+            )
+            frequency_probabilities[pairing] = probabilities
 
-        # If there are >1 sets of likelihoods, gets the mean for each boundary value.
-        if len(base_frequency_probabilities) > 1:
-            log.info("Multiple sets of base frequencies found, averaging...")
-            base_frequency_probabilities = np.array(base_frequency_probabilities)
-            base_frequency_probabilities = [
-                np.mean(base_frequency_probabilities[:, i])
-                for i in range(len(boundaries))
-            ]
+        return frequency_probabilities
 
-        probability_of_breach = GraphInterface.get_probability_of_breach(size, industry)
+    @staticmethod
+    def _get_breach_frequency_probabilities(
+        boundaries,
+        base_frequency_probabilities: np.ndarray,
+        probability_of_breach: Union[float, None],
+        pairing: Tuple,
+    ) -> Union[np.ndarray, None]:
+        """
+        Recalculates a set of base incident frequency probabilities as
+        proportions of a pairing's breach probability, if it has one.
+        """
         if probability_of_breach:
             log.info(
                 "Found specific >0 breaches probability value for one or both "
                 "of ('%s', '%s'), calculating follow-on values...",
-                size,
-                industry,
+                pairing[0],
+                pairing[1],
+            )
+            breach_frequency_probabilities = _rescale(
+                base_frequency_probabilities, float(probability_of_breach)
             )
-            # Sets the probability of having 0 breaches.
-            breach_frequency_probabilities = [(100 - probability_of_breach) / 100]
-
-            # Calculates the remaining probabilities proportional to the sum
-            # >0 breaches probability.
-            for base_frequency_probability in base_frequency_probabilities[0]:
-                breach_frequency_probabilities.append(
-                    (probability_of_breach * base_frequency_probability) / 100
-                )
 
             if len(breach_frequency_probabilities) != len(boundaries):
                 raise Exception("Mismatched boundaries!")
@@ -129,7 +372,42 @@ class GraphInterface:
         log.info("No breach probability value found.")
         return None
 
-    # pylint: disable=too-many-branches,too-many-locals,too-many-statements
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def _get_base_frequency_probabilities(
+        num_of_probabilities: int,
+    ) -> Union[np.ndarray, None]:
+        """
+        Returns (the average of) any sets of base incident frequency
+        probabilities with the given number of values.
+
+        These do not depend on the pairing, so the result is cached and shared
+        between calls until `invalidate()` is called.
+        """
+        base_frequency_probabilities = np.asarray(
+            [
+                properties["probabilities"]
+                for properties in GraphInterface._get_nodes(
+                    "IncidentBaseFrequencyProbabilities"
+                )
+                if len(properties["probabilities"]) == num_of_probabilities
+            ],
+            dtype=np.float64,
+        )
+
+        if len(base_frequency_probabilities) == 0:
+            log.info("No base frequencies found.")
+            return None
+
+        # If there are >1 sets of likelihoods, gets the mean for each boundary value.
+        if len(base_frequency_probabilities) > 1:
+            log.info("Multiple sets of base frequencies found, averaging...")
+        base_frequency_probabilities = base_frequency_probabilities.mean(axis=0)
+
+        # The same array is returned to every caller, so must not be modified.
+        base_frequency_probabilities.flags.writeable = False
+        return base_frequency_probabilities
+
     @staticmethod
     def get_probability_of_breach(size="All", industry="All") -> float:
         """
@@ -142,82 +420,17 @@ class GraphInterface:
         is not empirically grounded, however, so it may be that the opposite
         is true.
         """
-        size_probability = None
-        industry_probability = None
-
-        size_node = GraphInterface._get_node("Size", name=size)
-        if size_node:
-            log.info("Found node for size '%s'.", size)
-        else:
-            log.info("No node found for size '%s'.", size)
-
-        industry_node = GraphInterface._get_node("Industry", name=industry)
-        if industry_node:
-            log.info("Found node for industry '%s'.", industry)
-        else:
-            log.info("No node found for industry '%s'.", industry)
-
-        # If no figures were found for this pairing, returns None.
-        if size_node is None and industry_node is None:
-            return None
-
-        if size_node:
-            size_relations = GraphInterface.g.match({size_node}, r_type=FOR_SIZE)
-
-            size_probabilities = []
-            for rel in size_relations:
-                if rel.start_node.has_label("IncidentProbability"):
-                    size_probabilities.append(rel.start_node["probability"])
-
-            if len(size_probabilities) > 1:
-                log.info(
-                    "Multiple probabilities found for size '%s', averaging...", size
-                )
-                size_probability = sum(size_probabilities) / len(size_probabilities)
-            elif len(size_probabilities) == 1:
-                log.info("Probability value found for size '%s'.", size)
-                size_probability = size_probabilities[0]
-            else:
-                log.info("No probability value found for size '%s'.", size)
-
-        if industry_node:
-            industry_relations = GraphInterface.g.match(
-                {industry_node}, r_type=FOR_INDUSTRY
-            )
-            industry_probabilities = []
-            for rel in industry_relations:
-                if rel.start_node.has_label("IncidentProbability"):
-                    industry_probabilities.append(rel.start_node["probability"])
-
-            if len(industry_probabilities) > 1:
-                log.info(
-                    "Multiple probabilities found for industry '%s', averaging...",
-                    industry,
-                )
-                industry_probability = sum(industry_probabilities) / len(
-                    industry_probabilities
-                )
-            elif len(industry_probabilities) == 1:
-                log.info("Probability value found for industry '%s'.", industry)
-                industry_probability = industry_probabilities[0]
-            else:
-                log.info("No probability value found for industry '%s'.", industry)
-
-        if size_probability and industry_probability:
-            log.info(
-                "Probabilities found for both size '%s' and industry '%s', averaging...",
-                size,
-                industry,
-            )
-            probability = (size_probability + industry_probability) / 2
-        else:
-            probability = size_probability or industry_probability
+        # Gets the size and industry probabilities in a single round-trip.
+        result = GraphInterface._run(
+            PROBABILITY_OF_BREACH_QUERY, pairs=[{"size": size, "industry": industry}]
+        )[0]
 
-        return probability
+        probability = GraphInterface._combine_averages(
+            result, size, industry, PROBABILITY_OF_BREACH_STATISTICS
+        )
 
-    # pylint: enable=too-many-branches,too-many-locals,too-many-statements
+        return probability and probability[0]
 
-    # pylint: disable=too-many-branches,too-many-locals,too-many-statements
     @staticmethod
     def get_incident_cost_averages(
         pairing: Tuple = ("All", "All")
@@ -229,127 +442,118 @@ class GraphInterface:
         The CSBS specifies figures for breaches both 'with' and 'without outcomes'.
         We have ignored the latter here.
         """
-        size = pairing[0]
-        industry = pairing[1]
+        return GraphInterface.get_all_incident_cost_averages([pairing])[tuple(pairing)]
 
-        size_mean = None
-        size_median = None
-        industry_mean = None
-        industry_median = None
+    @staticmethod
+    def get_all_incident_cost_averages(
+        pairings,
+    ) -> Dict[Tuple, Union[Tuple[float, float], None]]:
+        """
+        Equivalent to calling `get_incident_cost_averages()` for each of the
+        given pairings, but looks them all up in a single query. Returns the
+        averages keyed by pairing.
+        """
+        pairs = [{"size": size, "industry": industry} for size, industry in pairings]
 
         log.info(
-            "Attempting to get incident cost averages specific to ('%s', '%s')...",
-            size,
-            industry,
+            "Attempting to get incident cost averages for %d pairings...", len(pairs)
         )
 
-        size_node = GraphInterface._get_node("Size", name=size)
-        if size_node:
-            log.info("Found node for size '%s'.", size)
-        else:
-            log.info("No node found for size '%s'.", size)
+        cost_averages = {}
+        for result in GraphInterface._stream(INCIDENT_COST_AVERAGES_QUERY, pairs=pairs):
+            pairing = (result["size"], result["industry"])
+            cost_averages[pairing] = GraphInterface._combine_averages(
+                result, *pairing, INCIDENT_COST_AVERAGES_STATISTICS
+            )
 
-        industry_node = GraphInterface._get_node("Industry", name=industry)
-        if industry_node:
-            log.info("Found node for industry '%s'.", industry)
-        else:
-            log.info("No node found for industry '%s'.", industry)
+        return cost_averages
 
-        # If no figures were found for this pairing, returns None.
-        if size_node is None and industry_node is None:
+    @staticmethod
+    def _combine_averages(
+        result: Dict, size: str, industry: str, statistics: Dict[str, str]
+    ) -> Union[Tuple[float, ...], None]:
+        """
+        Combines the size and industry values returned by a query for each of
+        the given statistics (keyed to their column suffixes) into one value each.
+        """
+        if not GraphInterface._log_nodes_found(
+            size, result["size_found"], industry, result["industry_found"]
+        ):
             return None
 
-        if size_node:
-            size_relations = GraphInterface.g.match({size_node}, r_type=FOR_SIZE)
-
-            size_means = []
-            size_medians = []
-            for rel in size_relations:
-                if rel.start_node.has_label("IncidentCostAverages"):
-                    size_means.append(rel.start_node["mean"])
-                    size_medians.append(rel.start_node["median"])
-
-            # Converts however many mean and median values returned into one of
-            # each.
-            if len(size_means) > 1:
-                log.info("Multiple mean values found for size '%s', averaging...", size)
-                size_mean = sum(size_means) / len(size_means)
-            elif len(size_means) == 1:
-                log.info("Mean value found for size '%s'.", size)
-                size_mean = size_means[0]
-            else:
-                log.info("No mean values found for size '%s'.", size)
-            if len(size_medians) > 1:
-                log.info(
-                    "Multiple median values found for size '%s', averaging...", size
-                )
-                size_median = sum(size_medians) / len(size_medians)
-            elif len(size_medians) == 1:
-                log.info("Median value found for size '%s'.", size)
-                size_median = size_medians[0]
-            else:
-                log.info("No median values found for size '%s'.", size)
+        size_node = "size '{}'".format(size)
+        industry_node = "industry '{}'".format(industry)
 
-        if industry_node:
-            industry_relations = GraphInterface.g.match(
-                {industry_node}, r_type=FOR_INDUSTRY
+        return tuple(
+            GraphInterface._combine(
+                statistic,
+                GraphInterface._average(result["size_" + column], statistic, size_node),
+                GraphInterface._average(
+                    result["industry_" + column], statistic, industry_node
+                ),
+                size,
+                industry,
             )
+            for statistic, column in statistics.items()
+        )
 
-            industry_means = []
-            industry_medians = []
-            for rel in industry_relations:
-                if rel.start_node.has_label("IncidentCostAverages"):
-                    industry_means.append(rel.start_node["mean"])
-                    industry_medians.append(rel.start_node["median"])
-
-            # Converts however many mean and median values returned into one of
-            # each.
-            if len(industry_means) > 1:
-                log.info(
-                    "Multiple mean values found for industry '%s', averaging...",
-                    industry,
-                )
-                industry_mean = sum(industry_means) / len(industry_means)
-            elif len(industry_means) == 1:
-                log.info("Mean value found for industry '%s'.", industry)
-                industry_mean = industry_means[0]
-            else:
-                log.info("No mean values found for industry '%s'.", industry)
-            if len(industry_medians) > 1:
-                log.info(
-                    "Multiple median values found for industry '%s', averaging...",
-                    industry,
-                )
-                industry_median = sum(industry_medians) / len(industry_medians)
-            elif len(industry_medians) == 1:
-                log.info("Median value found for industry '%s'.", industry)
-                industry_median = industry_medians[0]
+    @staticmethod
+    def _log_nodes_found(
+        size: str, size_found: bool, industry: str, industry_found: bool
+    ) -> bool:
+        """
+        Logs whether nodes were found for a pairing's size and industry, and
+        returns whether either was.
+        """
+        for node, name, found in (
+            ("size", size, size_found),
+            ("industry", industry, industry_found),
+        ):
+            if found:
+                log.info("Found node for %s '%s'.", node, name)
             else:
-                log.info("No median values found for industry '%s'.", industry)
+                log.info("No node found for %s '%s'.", node, name)
 
-        if size_mean and industry_mean:
-            log.info(
-                "Mean values found for both size '%s' and industry '%s', averaging...",
-                size,
-                industry,
-            )
-            mean = (size_mean + industry_mean) / 2
+        return size_found or industry_found
+
+    @staticmethod
+    def _average(values: List[float], statistic: str, node: str) -> Union[float, None]:
+        """
+        Converts however many values of a statistic were found for a size or
+        industry node into one, or None if there were none.
+        """
+        if len(values) > 1:
+            log.info("Multiple %s values found for %s, averaging...", statistic, node)
+        elif len(values) == 1:
+            log.info("%s value found for %s.", statistic.capitalize(), node)
         else:
-            mean = size_mean or industry_mean
+            log.info("No %s values found for %s.", statistic, node)
+            return None
 
-        if size_median and industry_median:
+        return sum(values) / len(values)
+
+    @staticmethod
+    def _combine(
+        statistic: str,
+        size_value: Union[float, None],
+        industry_value: Union[float, None],
+        size: str,
+        industry: str,
+    ) -> Union[float, None]:
+        """
+        Combines the size and industry values of a statistic, averaging them if
+        both were found.
+        """
+        if size_value and industry_value:
             log.info(
-                "Median values found for both size '%s' and industry '%s', averaging...",
+                "%s values found for both size '%s' and industry '%s', averaging...",
+                statistic.capitalize(),
                 size,
                 industry,
             )
-            median = (size_median + industry_median) / 2
-        else:
-            median = size_median or industry_median
+            return (size_value + industry_value) / 2
 
-        return mean, median
-
-    # pylint: enable=too-many-branches,too-many-locals,too-many-statements
+        return size_value or industry_value
 
     # pylint: disable=invalid-name,anomalous-backslash-in-string
     @staticmethod
@@ -379,115 +583,80 @@ class GraphInterface:
         """
         # pylint: enable=anomalous-backslash-in-string
 
-        size = pairing[0]
-        industry = pairing[1]
-
-        size_node = GraphInterface._get_node("Size", name=size)
-        if size_node:
-            log.info("Found node for size '%s'.", size)
-        else:
-            log.info("No node found for size '%s'.", size)
-
-        industry_node = GraphInterface._get_node("Industry", name=industry)
-        if industry_node:
-            log.info("Found node for industry '%s'.", industry)
-        else:
-            log.info("No node found for industry '%s'.", industry)
-
-        # If no figures were found for this pairing, returns the fallback values.
-        if size_node is None and industry_node is None:
-            return GraphInterface._get_frequency_distribution()
-
-        dist: Union[
-            Dict[float, float], None
-        ] = GraphInterface._get_frequency_distribution(size, industry)
-
-        if dist is not None:
-            log.debug(
-                "Returned values are: a = %s, b = %s", str(dist["a"]), str(dist["b"])
-            )
-
-        return dist
+        return GraphInterface._get_most_relevant_distribution(
+            pairing, GraphInterface._get_frequency_distribution
+        )
 
     # pylint: enable=invalid-name
 
-    # pylint: disable=anomalous-backslash-in-string
     @staticmethod
     def get_incident_costs_distribution(
         pairing: Tuple = ("All", "All")
     ) -> Union[Tuple[float, float], None]:
         """
         Returns the most relevant available incident costs distribution for
-        a given pairing.
-
-        The algorithm for determining this is currently very basic:
-
-        1. search for an exact match for the pairing, and return that if found; else
-        2. return the distribution for :math:`\left(\text{All}, \text{All}\right)`.
-
-        In future, this can and should be expanded to follow complex heuristics
-        for similarity (and some relationships for doing so are provided at the
-        end of this module). For example, two industries can be joined using the
-        SIMILAR_TO relationship, which would allow the algorithm to traverse
-        laterally to other leaf nodes.
-
-        An even simpler improvement would be to add handling for partial matches
-        (e.g., returning :math:`\left(\text{Micro}, \text{All}\right)`, which
-        should be more relevant to a :math:`\left(\text{Micro}, \text{IT}\right)`
-        organisation than the fallback :math:`\left(\text{All}, \text{All}\right)`
-        values will be.
+        a given pairing, as determined for `get_incident_frequency_distribution()`.
         """
-        # pylint: enable=anomalous-backslash-in-string
-
-        size = pairing[0]
-        industry = pairing[1]
-
-        size_node = GraphInterface._get_node("Size", name=size)
-        if size_node:
-            log.info("Found node for size '%s'.", size)
-        else:
-            log.info("No node found for size '%s'.", size)
+        return GraphInterface._get_most_relevant_distribution(
+            pairing, GraphInterface._get_costs_distribution
+        )
 
-        industry_node = GraphInterface._get_node("Industry", name=industry)
-        if industry_node:
-            log.info("Found node for industry '%s'.", industry)
-        else:
-            log.info("No node found for industry '%s'.", industry)
+    @staticmethod
+    def _get_most_relevant_distribution(
+        pairing: Tuple, get_distribution
+    ) -> Union[Dict[float, float], None]:
+        """
+        Returns the distribution for a pairing from `get_distribution`, or the
+        fallback distribution if neither its size nor its industry are known.
+        """
+        size, industry = pairing
 
         # If no figures were found for this pairing, returns the fallback values.
-        if size_node is None and industry_node is None:
-            return GraphInterface._get_costs_distribution()
-
-        dist: Union[Dict[float, float], None] = GraphInterface._get_costs_distribution(
-            size, industry
-        )
+        if not GraphInterface._log_nodes_found(
+            size,
+            GraphInterface._node_exists("Size", size),
+            industry,
+            GraphInterface._node_exists("Industry", industry),
+        ):
+            return get_distribution()
 
-        if dist is not None:
-            log.debug(
-                "Returned values are: mean = %s, stddev = %s",
-                str(dist["mean"]),
-                str(dist["stddev"]),
-            )
+        dist = get_distribution(size, industry)
+        log.debug("Returned values are: %s", str(dist))
 
         return dist
 
     @staticmethod
     def get_sizes() -> List[str]:
         """Returns a list of all of the organisation size values."""
-        nodes = GraphInterface._get_nodes("Size")
+        if "Size" not in GraphInterface._names_cache:
+            GraphInterface._names_cache["Size"] = [
+                record["name"] for record in GraphInterface._run(SIZES_QUERY)
+            ]
 
-        return [node["name"] for node in nodes]
+        return GraphInterface._names_cache["Size"]
 
     @staticmethod
     def get_industries() -> List[str]:
         """Returns a list of all of the organisation industry values."""
-        nodes = GraphInterface._get_nodes("Industry")
+        if "Industry" not in GraphInterface._names_cache:
+            GraphInterface._names_cache["Industry"] = [
+                record["name"] for record in GraphInterface._run(INDUSTRIES_QUERY)
+            ]
 
-        return [node["name"] for node in nodes]
+        return GraphInterface._names_cache["Industry"]
 
     @staticmethod
     def get_sizes_and_industries() -> Tuple[list, list]:
         """Returns all available organisation size and industry values."""
+        if (
+            "Size" not in GraphInterface._names_cache
+            or "Industry" not in GraphInterface._names_cache
+        ):
+            names = {"Size": [], "Industry": []}
+            for record in GraphInterface._run(SIZES_AND_INDUSTRIES_QUERY):
+                names[record["label"]].append(record["name"])
+            GraphInterface._names_cache.update(names)
+
         return GraphInterface.get_sizes(), GraphInterface.get_industries()
 
     # pylint: disable=invalid-name
@@ -496,14 +665,17 @@ class GraphInterface:
         pairing: Tuple, a: float, b: float
     ) -> Node:
         """Adds an `IncidentFrequencyDistribution` node to the Neo4j graph database."""
-        size_node = GraphInterface._get_node("Size", name=pairing[0])
-        industry_node = GraphInterface._get_node("Industry", name=pairing[1])
-
-        node = GraphInterface._create_node(
-            "IncidentFrequencyDistribution", a=a, b=b, calculated_at=datetime.now()
+        tx = GraphInterface._graph().begin()
+        node = tx.evaluate(
+            CREATE_FREQUENCY_DISTRIBUTION_QUERY,
+            size=pairing[0],
+            industry=pairing[1],
+            a=a,
+            b=b,
+            calculated_at=datetime.now(),
         )
-        GraphInterface._create_relationship(node, FOR_SIZE, size_node)
-        GraphInterface._create_relationship(node, FOR_INDUSTRY, industry_node)
+        tx.commit()
+        GraphInterface.invalidate("IncidentFrequencyDistribution")
         return node
 
     # pylint: enable=invalid-name
@@ -513,19 +685,94 @@ class GraphInterface:
         pairing: Tuple, mean: float, stddev: float
     ) -> Node:
         """Adds an `IncidentCostsDistribution` node to the Neo4j graph database."""
-        size_node = GraphInterface._get_node("Size", name=pairing[0])
-        industry_node = GraphInterface._get_node("Industry", name=pairing[1])
-
-        node = GraphInterface._create_node(
-            "IncidentCostsDistribution",
+        tx = GraphInterface._graph().begin()
+        node = tx.evaluate(
+            CREATE_COSTS_DISTRIBUTION_QUERY,
+            size=pairing[0],
+            industry=pairing[1],
             mean=mean,
             stddev=stddev,
             calculated_at=datetime.now(),
         )
-        GraphInterface._create_relationship(node, FOR_SIZE, size_node)
-        GraphInterface._create_relationship(node, FOR_INDUSTRY, industry_node)
+        tx.commit()
+        GraphInterface.invalidate("IncidentCostsDistribution")
         return node
 
+    @staticmethod
+    def get_many_frequency_distributions(
+        pairings: List[Tuple[str, str]]
+    ) -> Dict[Tuple[str, str], Dict[float, float]]:
+        """
+        Returns the :math:`a` and :math:`b` values from the incident frequency
+        distribution nodes for each of the given pairings, using a single query.
+
+        Pairings without a distribution node are omitted from the result.
+        """
+        return GraphInterface._get_many_distributions(
+            "IncidentFrequencyDistribution",
+            FREQUENCY_DISTRIBUTIONS_QUERY,
+            ("a", "b"),
+            pairings,
+        )
+
+    @staticmethod
+    def get_many_costs_distributions(
+        pairings: List[Tuple[str, str]]
+    ) -> Dict[Tuple[str, str], Dict[float, float]]:
+        """
+        Returns the mean and standard deviation values from the incident costs
+        distribution nodes for each of the given pairings, using a single query.
+
+        Pairings without a distribution node are omitted from the result.
+        """
+        return GraphInterface._get_many_distributions(
+            "IncidentCostsDistribution",
+            COSTS_DISTRIBUTIONS_QUERY,
+            ("mean", "stddev"),
+            pairings,
+        )
+
+    @staticmethod
+    def _get_many_distributions(
+        label: str, cypher: str, parameters: Tuple[str, ...], pairings
+    ) -> Dict[Tuple[str, str], Dict[float, float]]:
+        """
+        Returns the given parameters of the `label` distribution nodes for each
+        of the given pairings, from the cache or else using the `cypher` query.
+        Where a pairing has multiple nodes, their parameters are averaged.
+        """
+        dists = {}
+        pairs = []
+        for size, industry in pairings:
+            cached_dist = GraphInterface._get_cached_distribution(label, size, industry)
+            if cached_dist is not None:
+                dists[(size, industry)] = cached_dist
+            else:
+                pairs.append({"size": size, "industry": industry})
+
+        if len(pairs) == 0:
+            return dists
+
+        nodes = {}
+        for record in GraphInterface._run(cypher, pairs=pairs):
+            nodes.setdefault((record["size"], record["industry"]), []).append(record)
+        log.debug("Results: %s", str(nodes))
+
+        for pair, pair_nodes in nodes.items():
+            if len(pair_nodes) > 1:
+                log.info("Multiple fallback nodes found, averaging parameters...")
+
+            dists[pair] = {
+                parameter: sum(node[parameter] for node in pair_nodes) / len(pair_nodes)
+                for parameter in parameters
+            }
+            GraphInterface._distribution_cache[(label,) + pair] = (
+                time.monotonic(),
+                dists[pair],
+            )
+
+        return dists
+
     # pylint: disable=anomalous-backslash-in-string,invalid-name
     @staticmethod
     def _get_frequency_distribution(
@@ -538,40 +785,12 @@ class GraphInterface:
         """
         # pylint: enable=anomalous-backslash-in-string
 
-        # pylint: disable=line-too-long
-        result = GraphInterface.g.run(
-            "MATCH (:Size {{name:'{}'}})<-[:FOR_SIZE]-(node:IncidentFrequencyDistribution)-[:FOR_INDUSTRY]->(:Industry {{name:'{}'}}) "
-            "RETURN node;".format(size, industry)
+        return GraphInterface._get_distribution(
+            GraphInterface.get_many_frequency_distributions,
+            "incident frequency",
+            size,
+            industry,
         )
-        # pylint: enable=line-too-long
-
-        nodes = [record["node"] for record in result]
-
-        if len(nodes) == 0:
-            # There should always be a (All, All) distribution at least.
-            if size == "All" and industry == "All":
-                raise Exception("No fallback node found!")
-
-            log.debug(
-                "No incident frequency distribution found for (%s, %s).",
-                str(size),
-                str(industry),
-            )
-            return None, None
-        log.debug("Results: %s", str(nodes))
-
-        a = [node["a"] for node in nodes]
-        b = [node["b"] for node in nodes]
-
-        if len(nodes) > 0:
-            log.info("Multiple fallback nodes found, averaging parameters...")
-            a = sum(a) / len(a)
-            b = sum(b) / len(b)
-        else:
-            a = a[0]
-            b = b[0]
-
-        return {"a": a, "b": b}
 
     # pylint: enable=invalid-name
 
@@ -581,52 +800,57 @@ class GraphInterface:
         size: str = "All", industry: str = "All"
     ) -> Dict[float, float]:
         """
-        Returns the :math:`a` and :math:`b` values from the requested incident
-        frequency distribution node (if it exists). Call with no arguments to
+        Returns the mean and standard deviation values from the requested
+        incident costs distribution node (if it exists). Call with no arguments to
         use the fallback (:math:`\left(\text{All}, \text{All}\right)`) node.
         """
         # pylint: enable=anomalous-backslash-in-string
 
-        # pylint: disable=line-too-long
-        result = GraphInterface.g.run(
-            "MATCH (:Size {{name:'{}'}})<-[:FOR_SIZE]-(node:IncidentCostsDistribution)-[:FOR_INDUSTRY]->(:Industry {{name:'{}'}}) "
-            "RETURN node;".format(size, industry)
+        return GraphInterface._get_distribution(
+            GraphInterface.get_many_costs_distributions,
+            "incident costs",
+            size,
+            industry,
         )
-        # pylint: enable=line-too-long
 
-        nodes = [record["node"] for record in result]
+    @staticmethod
+    def _get_distribution(
+        get_many_distributions, description: str, size: str, industry: str
+    ) -> Union[Dict[float, float], None]:
+        """
+        Returns a single pairing's distribution from `get_many_distributions`,
+        raising an `Exception` if it is the missing fallback distribution.
+        """
+        dist = get_many_distributions([(size, industry)]).get((size, industry))
 
-        if len(nodes) == 0:
+        if dist is None:
             # There should always be a (All, All) distribution at least.
             if size == "All" and industry == "All":
                 raise Exception("No fallback node found!")
 
-            log.debug(
-                "No incident frequency distribution found for (%s, %s).",
-                str(size),
-                str(industry),
-            )
-            return None, None
-        log.debug("Results: %s", str(nodes))
+            log.debug("No %s distribution found for %s.", description, (size, industry))
 
-        mean = [node["mean"] for node in nodes]
-        stddev = [node["stddev"] for node in nodes]
+        return dist
 
-        if len(nodes) > 1:
-            log.info("Multiple fallback nodes found, averaging parameters...")
-            mean = sum(mean) / len(mean)
-            stddev = sum(stddev) / len(stddev)
-        else:
-            mean = mean[0]
-            stddev = stddev[0]
+    @staticmethod
+    def _get_cached_distribution(
+        label: str, size: str, industry: str
+    ) -> Union[Dict[float, float], None]:
+        """
+        Returns a previously-fetched distribution for the pairing, if one was
+        cached less than `DISTRIBUTION_CACHE_TTL` seconds ago.
+        """
+        cached = GraphInterface._distribution_cache.get((label, size, industry))
+        if cached is None or time.monotonic() - cached[0] > DISTRIBUTION_CACHE_TTL:
+            return None
 
-        return {"mean": mean, "stddev": stddev}
+        return cached[1]
 
     # pylint: disable=invalid-name
     @staticmethod
     def _create_node(*labels, **properties) -> Node:
         """Creates a new node in the Neo4j graph database."""
-        tx = GraphInterface.g.begin()
+        tx = GraphInterface._graph().begin()
         node = Node(*labels, **properties)
         tx.create(node)
         tx.commit()
@@ -639,11 +863,16 @@ class GraphInterface:
     def _create_relationship(
         start_node, relationship, end_node, **properties
     ) -> Relationship:
-        """Creates a new relationship in the Neo4j graph database."""
-        tx = GraphInterface.g.begin()
-        relationship = Relationship(
-            start_node, relationship.__name__, end_node, **properties
-        )
+        """
+        Creates a new relationship in the Neo4j graph database.
+
+        `relationship` should be one of the `Relationship` subclasses defined at
+        the end of this module, which take their type from the class name. This
+        is a general-purpose utility; the distribution nodes are created along
+        with their relationships in a single query instead.
+        """
+        tx = GraphInterface._graph().begin()
+        relationship = relationship(start_node, end_node, **properties)
         tx.create(relationship)
         tx.commit()
         return relationship
@@ -651,25 +880,65 @@ class GraphInterface:
     # pylint: enable=invalid-name
 
     @staticmethod
-    def _get_node(*labels, **properties) -> Union[Node, None]:
-        """Returns a node from the Neo4j graph database."""
-        return GraphInterface.g.nodes.match(*labels, **properties).first()
+    def _run(cypher: str, **parameters) -> List[Dict]:
+        """
+        Runs a read query against the Neo4j graph database and returns its
+        records as `dict`s, using the `neo4j` driver if it is enabled.
+        """
+        graph = GraphInterface._graph()
+        if GraphInterface.driver is None:
+            return graph.run(cypher, **parameters).data()
+
+        return GraphInterface._session().run(cypher, **parameters).data()
 
     @staticmethod
-    def _get_nodes(*labels, **properties) -> NodeMatcher:
-        """Returns a node from the Neo4j graph database."""
-        return GraphInterface.g.nodes.match(*labels, **properties)
+    def _stream(cypher: str, **parameters) -> Iterator[Dict]:
+        """
+        Runs a read query against the Neo4j graph database and yields its
+        records as `dict`s one at a time, rather than materialising them all.
+        """
+        graph = GraphInterface._graph()
+        if GraphInterface.driver is None:
+            result = graph.run(cypher, **parameters)
+        else:
+            result = GraphInterface._session().run(cypher, **parameters)
+
+        for record in result:
+            yield record.data()
 
     @staticmethod
-    def _dict_to_jsobj(properties) -> str:
-        """Recursively converts a Python `dict` into a JS `Object`."""
-        if isinstance(properties, dict):
-            return re.sub("'([a-z_]*)':", "\\1:", str(properties))
+    def _session():
+        """Returns the `neo4j` driver session for the current thread."""
+        session = getattr(GraphInterface._sessions, "session", None)
+        if session is None:
+            session = GraphInterface.driver.session()
+            GraphInterface._sessions.session = session
+
+        return session
 
-        if isinstance(properties, str):
-            return GraphInterface._dict_to_jsobj({"name": properties})
+    @staticmethod
+    @functools.lru_cache(maxsize=256)
+    def _node_exists(label: str, name: str) -> bool:
+        """
+        Returns whether a node with the given label and name exists in the Neo4j
+        graph database. The result is cached until `invalidate()` is called.
+        """
+        return GraphInterface._graph().nodes.match(label, name=name).exists()
+
+    @staticmethod
+    def _get_nodes(*labels, **properties) -> Iterator[Dict]:
+        """Yields the properties of each matching node in the Neo4j graph database."""
+        cypher = "MATCH (n{}) {}RETURN properties(n) AS p;".format(
+            "".join(":" + label for label in labels),
+            "WHERE {} ".format(
+                " AND ".join("n.{0} = ${0}".format(key) for key in properties)
+            )
+            if properties
+            else "",
+        )
 
-        return "{}"
+        for record in GraphInterface._stream(cypher, **properties):
+            yield record["p"]
 
 
 # pylint: disable=invalid-name,missing-class-docstring
@@ -10,18 +10,26 @@
 import os
 import sys
 import argparse
+import functools
 import pickle
 import logging as log
 
 from typing import Tuple, Dict, Union
 
-import random
 import math
 import numpy as np
-import pandas as pd
+from joblib import Parallel, delayed, effective_n_jobs
 from matplotlib import pyplot as plt
+from scipy.stats import gaussian_kde
 
 from graph import GraphInterface as gi
+from numba_compat import (
+    NUMBA_AVAILABLE,
+    NUMBA_NUM_THREADS,
+    njit,
+    prange,
+    set_num_threads,
+)
 
 # Used for logging, equivalent to `logging.INFO`.
 SUCCESS = 20
@@ -29,10 +37,18 @@ SUCCESS = 20
 # If not specified, the default number of Monte Carlo simulation runs to perform.
 DEFAULT_RUNS = 5000
 
+# If not specified, the default number of processes to split the simulation runs
+# across.
+DEFAULT_JOBS = 1
+
 # The arbitrary maximum number of incidents that an organisation can experience
 # in a year.
 MAX_ANNUAL_INCIDENTS = 8000
 
+# The most incident costs to draw at once when simulating, which bounds the
+# memory used by the simulation regardless of the number of runs.
+MAX_COSTS_PER_DRAW = 4 * 1024 * 1024
+
 # The maximum value of a company; any yearly losses over result in a bankruptcy
 COMPANY_VALUE = 100000
 
@@ -65,50 +81,157 @@ N = None
 OUTPUT_DIR = None
 IMAGES = None
 FORCE = None
+JOBS = None
+SEED = None
+NUMBA = None
+
+# The seed sequence that the simulation's random number generators are derived
+# from, and the generator shared by the simulation functions. Both are
+# re-seeded in `main()` if a seed is given.
+_SEED_SEQUENCE = np.random.SeedSequence()
+_RNG = np.random.default_rng(_SEED_SEQUENCE)
 
 
-def _calculate_num_of_incidents(incidents_dist: Dict[float, float]) -> float:
-    """Calculate how many incidents have occurred in a given year."""
+def _calculate_nums_of_incidents(
+    incidents_dist: Dict[float, float], n: int, rng: np.random.Generator
+) -> np.ndarray:
+    """Calculate how many incidents have occurred in each of `n` years."""
 
     log.debug("Incident distribution: %s", str(incidents_dist))
 
-    num_of_incidents = incidents_dist["b"] / (1 - np.random.uniform()) ** (
-        1 / incidents_dist["a"]
+    nums_of_incidents = incidents_dist["b"] * (1.0 - rng.random(n)) ** (
+        -1.0 / incidents_dist["a"]
     )
-    log.debug("Number of incidents (as `int`): %s", str(int(num_of_incidents)))
 
-    return (
-        int(num_of_incidents)
-        if num_of_incidents <= MAX_ANNUAL_INCIDENTS
-        else MAX_ANNUAL_INCIDENTS
-    )
+    return np.minimum(nums_of_incidents, MAX_ANNUAL_INCIDENTS).astype(np.int64)
 
 
-def _calculate_sum_cost_of_incidents(
-    num_of_incidents: int, costs_dist: Dict[float, float], idx: int = None
-) -> float:
-    """For a list of incident numbers, calculate how much each breach cost and
-    return the sum."""
+def _get_lognormal_parameters(costs_dist: Dict[float, float]) -> Tuple[float, float]:
+    """
+    Convert the mean and standard deviation of a costs distribution into the
+    location and shape parameters of the equivalent lognormal distribution.
+    """
+
+    mean = costs_dist["mean"]
+    var = costs_dist["stddev"] ** 2
+
+    loc = math.log(mean * mean / math.sqrt(var + mean * mean))
+    shape = math.sqrt(math.log(1 + var / (mean * mean)))
+
+    return loc, shape
 
-    log.debug("Costs distribution: %s", str(costs_dist))
 
-    if (N < 1000) or (N >= 1000 and idx % math.floor(N / 100) == 0):
-        log.info(
-            "Running Monte Carlo simulation... (%s/%s iterations)", str(idx), str(N)
+def _calculate_sum_costs_of_incidents(
+    nums_of_incidents: np.ndarray, loc: float, shape: float, rng: np.random.Generator
+) -> np.ndarray:
+    """
+    For an array of annual incident numbers, calculate how much each breach
+    cost and return the sum for each year.
+
+    The costs are drawn for blocks of years at a time, each block holding at
+    most `MAX_COSTS_PER_DRAW` incidents, then summed per year.
+    """
+
+    sum_costs = np.zeros(len(nums_of_incidents), dtype=np.float32)
+    ends = np.cumsum(nums_of_incidents)
+
+    start = 0
+    while start < len(nums_of_incidents):
+        # Gets the first year that doesn't fit in this block (always taking at
+        # least one year) and the index of each year's first incident cost.
+        base = ends[start - 1] if start > 0 else 0
+        stop = max(
+            start + 1,
+            int(np.searchsorted(ends, base + MAX_COSTS_PER_DRAW, side="right")),
         )
+        nums = nums_of_incidents[start:stop]
+        offsets = ends[start:stop] - nums - base
+
+        # `reduceat` sums up to the next index, and returns the value at the
+        # index for empty slices, so only years with incidents are passed to it.
+        # The costs are summed at full precision, but single precision is
+        # plenty for the resulting annual totals, which are only plotted and
+        # averaged.
+        has_incidents = nums > 0
+        if has_incidents.any():
+            costs = rng.lognormal(loc, shape, int(ends[stop - 1] - base))
+            sum_costs[start:stop][has_incidents] = np.add.reduceat(
+                costs, offsets[has_incidents]
+            )
+
+        start = stop
+
+    return sum_costs
+
+
+def _simulate_years(
+    n: int,
+    incidents_dist: Dict[float, float],
+    loc: float,
+    shape: float,
+    rng: np.random.Generator,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Simulate `n` years, returning the number of incidents in each and their
+    summed costs."""
+
+    nums_of_incidents = _calculate_nums_of_incidents(incidents_dist, n, rng)
+    sum_costs = _calculate_sum_costs_of_incidents(nums_of_incidents, loc, shape, rng)
+
+    return nums_of_incidents, sum_costs
+
 
-    if num_of_incidents == 0:
-        return 0
+def _simulate_years_in_parallel(
+    n: int,
+    incidents_dist: Dict[float, float],
+    loc: float,
+    shape: float,
+    jobs: int,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Simulate `n` years split as evenly as possible across `jobs` processes,
+    returning the number of incidents in each and their summed costs."""
+
+    # Each process gets its own independent random number stream
+    rngs = [np.random.default_rng(s) for s in _SEED_SEQUENCE.spawn(jobs)]
+    size, extra = divmod(n, jobs)
+    sizes = [size + 1] * extra + [size] * (jobs - extra)
+
+    results = Parallel(n_jobs=jobs)(
+        delayed(_simulate_years)(chunk_n, incidents_dist, loc, shape, rng)
+        for chunk_n, rng in zip(sizes, rngs)
+    )
 
-    loc = np.log(
-        costs_dist["mean"] ** 2
-        / np.sqrt(costs_dist["stddev"] ** 2 + costs_dist["mean"] ** 2)
+    return (
+        np.concatenate([r[0] for r in results]),
+        np.concatenate([r[1] for r in results]),
     )
-    shape = np.sqrt(np.log(1 + (costs_dist["stddev"] ** 2 / costs_dist["mean"] ** 2)))
 
-    costs = [random.lognormvariate(loc, shape) for r in range(num_of_incidents)]
 
-    return sum(costs)
+@njit(parallel=True, fastmath=True, cache=True)
+def _simulate(
+    n: int, a: float, b: float, loc: float, shape: float
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Simulate `n` years, returning the number of incidents in each and their
+    summed costs. This is the JIT-compiled equivalent of `_simulate_years()`,
+    with the years run in parallel.
+    """
+
+    nums_of_incidents = np.empty(n, dtype=np.int64)
+    sum_costs = np.empty(n, dtype=np.float32)
+
+    for i in prange(n):  # pylint: disable=not-an-iterable
+        num_of_incidents = int(
+            min(b * (1.0 - np.random.random()) ** (-1.0 / a), MAX_ANNUAL_INCIDENTS)
+        )
+
+        sum_cost = 0.0
+        for _ in range(num_of_incidents):
+            sum_cost += np.random.lognormal(loc, shape)
+
+        nums_of_incidents[i] = num_of_incidents
+        sum_costs[i] = sum_cost
+
+    return nums_of_incidents, sum_costs
 
 
 # pylint: disable=invalid-name
@@ -139,6 +262,19 @@ def _get_most_relevant_incident_costs_distribution(
     return gi.get_incident_costs_distribution(pairing)
 
 
+@functools.lru_cache(maxsize=64)
+def _load_cached_distributions(pairing: Tuple) -> Dict:
+    """
+    Load the previously-calculated distributions for a pairing from the output
+    directory. Raises `OSError` if there are none, so that misses aren't
+    cached.
+    """
+
+    filename = "{}-{}.pickle".format(pairing[0], pairing[1])
+    with open(OUTPUT_DIR + filename, "rb") as file:
+        return pickle.load(file)
+
+
 def _get_most_relevant_distributions(
     pairing: Tuple = ("All", "All")
 ) -> Dict[Union[Dict[float, float], None], Union[Dict[float, float], None]]:
@@ -149,17 +285,14 @@ def _get_most_relevant_distributions(
     # Retrieves previously-calculated values if possible
     if not FORCE and OUTPUT_DIR is not None:
         try:
-            filename = "{}-{}.pickle".format(pairing[0], pairing[1])
-            dists = pickle.load(open(OUTPUT_DIR + filename, "rb"))
+            dists = _load_cached_distributions(tuple(pairing))
 
             log.info("Previously-calculated distributions found")
             return dists["incidents"], dists["costs"]
         except (OSError, IOError):
             log.info("Previously-calculated distributions not found")
 
-    # Otherwise, generates fresh ones
-    gi.__init__()
-
+    # Otherwise, generates fresh ones (connecting to the database as needed)
     incidents_dist = _get_most_relevant_incident_frequency_distribution(pairing)
     costs_dist = _get_most_relevant_incident_costs_distribution(pairing)
 
@@ -176,7 +309,8 @@ def _get_most_relevant_distributions(
             "costs": costs_dist,
         }
         filename = "{}-{}.pickle".format(pairing[0], pairing[1])
-        pickle.dump(dists, open(OUTPUT_DIR + filename, "wb"))
+        with open(OUTPUT_DIR + filename, "wb") as file:
+            pickle.dump(dists, file)
 
     return incidents_dist, costs_dist
 
@@ -195,50 +329,71 @@ def _run_monte_carlo_simulation(pairing: Tuple = ("All", "All")) -> None:
     if incidents_dist is None and costs_dist is None:
         return incidents_dist, costs_dist
 
-    # Calculates the number of incidents suffered over $n$ simulated years
-    nums_of_incidents = np.array(
-        [_calculate_num_of_incidents(incidents_dist) for i in range(N)]
-    )
+    log.debug("Costs distribution: %s", str(costs_dist))
+    loc, shape = _get_lognormal_parameters(costs_dist)
+
+    # Calculates the number of incidents suffered over $n$ simulated years, and
+    # their annual costs
+    log.info("Running Monte Carlo simulation... (%s iterations)", str(N))
+    jobs = min(effective_n_jobs(JOBS), N)
+    use_numba = NUMBA and NUMBA_AVAILABLE and SEED is None
+    if NUMBA and not use_numba:
+        log.warning("Numba kernel unavailable or seeded, falling back to NumPy.")
+
+    if use_numba:
+        # The compiled kernel runs the years across `jobs` threads itself, but
+        # its random number streams can't be seeded reproducibly
+        set_num_threads(min(jobs, NUMBA_NUM_THREADS))
+        nums_of_incidents, sum_costs = _simulate(
+            N, incidents_dist["a"], incidents_dist["b"], loc, shape
+        )
+    elif jobs == 1:
+        nums_of_incidents, sum_costs = _simulate_years(
+            N, incidents_dist, loc, shape, _RNG
+        )
+    else:
+        nums_of_incidents, sum_costs = _simulate_years_in_parallel(
+            N, incidents_dist, loc, shape, jobs
+        )
+    sum_costs = np.ascontiguousarray(sum_costs, dtype=np.float32)
     log.debug("Number of incidents: %s", str(nums_of_incidents))
 
-    _label_plot(
-        "Histogram of Incident Frequencies (over 12 months)",
-        "Number of Incidents ($log_{10}$)",
-        "Frequency",
-    )
-    plt.hist(
-        [np.log10(i) if i > 0 else 0 for i in nums_of_incidents],
-        align="left",
-        bins=range(12),
-    )
-    _save_plot("2 - histogram of incident frequencies")
-
-    # Calculates the annual costs for each simulated year
-    log.info("Running Monte Carlo simulation... (0/%s iterations)", str(N))
-    sum_costs = [
-        _calculate_sum_cost_of_incidents(num_of_incidents, costs_dist, idx)
-        for idx, num_of_incidents in enumerate(nums_of_incidents, start=1)
-    ]
-    log.info("Running Monte Carlo simulation... (%s/%s iterations)", str(N), str(N))
+    # Only the LEC is output by default, so the intermediate plots are only
+    # drawn if they are going to be saved.
+    if IMAGES:
+        _label_plot(
+            "Histogram of Incident Frequencies (over 12 months)",
+            "Number of Incidents ($log_{10}$)",
+            "Frequency",
+        )
+        plt.hist(
+            np.log10(np.maximum(nums_of_incidents, 1)),
+            align="left",
+            bins=range(12),
+        )
+        _save_plot("2 - histogram of incident frequencies")
 
-    _label_plot(
-        "Histogram of Sum Costs (over 12 months)", "Total Cost (£)", "Frequency"
-    )
-    plt.ticklabel_format(style="plain")
-    plt.hist(sum_costs, align="left", bins=15, range=(0, COMPANY_VALUE))
-    _save_plot("4 - histogram of sum costs")
+        _label_plot(
+            "Histogram of Sum Costs (over 12 months)", "Total Cost (£)", "Frequency"
+        )
+        plt.ticklabel_format(style="plain")
+        plt.hist(sum_costs, align="left", bins=15, range=(0, COMPANY_VALUE))
+        _save_plot("4 - histogram of sum costs")
 
-    _label_plot("Density of Sum Costs (over 12 months)", "Total Cost (£)", "Density")
-    pd.Series(sum_costs).plot(kind="density")
-    plt.xlim(0, COMPANY_VALUE * 2)
-    plt.ticklabel_format(style="plain")
-    _save_plot("5 - density of sum costs")
+        _label_plot(
+            "Density of Sum Costs (over 12 months)", "Total Cost (£)", "Density"
+        )
+        grid = np.linspace(0, COMPANY_VALUE * 2, 512)
+        plt.plot(grid, gaussian_kde(sum_costs)(grid))
+        plt.xlim(0, COMPANY_VALUE * 2)
+        plt.ticklabel_format(style="plain")
+        _save_plot("5 - density of sum costs")
 
     # Get loss exceedance curve
     log.info("Generating loss exceedance curve")
 
     hist, edges = np.histogram(sum_costs, bins=LEC_PRECISION)
-    cumrev = np.cumsum(hist[::-1])[::-1] * 100 / len(sum_costs)
+    cumrev = np.cumsum(hist[::-1])[::-1].astype(np.float64) * (100.0 / sum_costs.size)
 
     _label_plot(
         "Loss Exceedance Curve (Monte Carlo sim)",
@@ -248,19 +403,30 @@ def _run_monte_carlo_simulation(pairing: Tuple = ("All", "All")) -> None:
     plt.ticklabel_format(style="plain")
     plt.xlim(0, COMPANY_VALUE)
     plt.plot(edges[:-1], cumrev)
-    _save_plot("6 - lec" if IMAGES else "lec")
+    _save_plot("6 - lec" if IMAGES else "lec", always=True)
 
     log.info("Simulation complete!")
 
     return nums_of_incidents, sum_costs
 
 
-def main():
-    """Called when the script is run from the command-line"""
-    # pylint: disable=global-statement
-    global N, OUTPUT_DIR, IMAGES, FORCE
-    # pylint: enable=global-statement
+def _jobs(value: str) -> int:
+    """Parses a number of jobs, which must be positive or -1 (for all CPUs)"""
+    try:
+        jobs = int(value)
+    except ValueError:
+        jobs = 0
+
+    if jobs == 0 or jobs < -1:
+        raise argparse.ArgumentTypeError(
+            "must be a positive integer, or -1 for all available CPUs"
+        )
 
+    return jobs
+
+
+def _parse_args() -> argparse.Namespace:
+    """Parses the command-line arguments"""
     parser = argparse.ArgumentParser()
 
     parser.add_argument(
@@ -307,6 +473,30 @@ def main():
         action="store_true",
         default=False,
     )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        help="The number of processes (or threads, with --numba) to run the \
+            simulations across, or -1 for all available CPUs (default: "
+        + str(DEFAULT_JOBS)
+        + ")",
+        type=_jobs,
+        default=DEFAULT_JOBS,
+    )
+    parser.add_argument(
+        "--seed",
+        help="Seed the random number generators, for reproducible results \
+            (default: none)",
+        type=int,
+        default=None,
+    )
+    parser.add_argument(
+        "--numba",
+        help="Run the simulations with the Numba-compiled kernel, if Numba is \
+            installed and no seed is given (default: false)",
+        action="store_true",
+        default=False,
+    )
     parser.add_argument(
         "-v",
         "--verbose",
@@ -322,12 +512,28 @@ def main():
         default=False,
     )
 
-    args = parser.parse_args()
+    return parser.parse_args()
+
+
+def main():
+    """Called when the script is run from the command-line"""
+    # pylint: disable=global-statement
+    global N, OUTPUT_DIR, IMAGES, FORCE, JOBS, SEED, NUMBA, _SEED_SEQUENCE, _RNG
+    # pylint: enable=global-statement
+
+    args = _parse_args()
 
     N = args.number
     OUTPUT_DIR = args.output
     IMAGES = args.images
     FORCE = args.force
+    JOBS = args.jobs
+    SEED = args.seed
+    NUMBA = args.numba
+
+    if SEED is not None:
+        _SEED_SEQUENCE = np.random.SeedSequence(SEED)
+        _RNG = np.random.default_rng(_SEED_SEQUENCE)
 
     size = args.size
     industry = args.industry
@@ -354,8 +560,8 @@ def main():
                 str(sum_costs),
             )
 
-            avg_num_of_incidents = int(sum(nums_of_incidents) / len(nums_of_incidents))
-            avg_sum_costs = sum(sum_costs) / len(sum_costs)
+            avg_num_of_incidents = int(np.mean(nums_of_incidents))
+            avg_sum_costs = float(np.mean(sum_costs, dtype=np.float64))
             log.log(
                 SUCCESS,
                 "Results:\nAverage number of incidents: %d\nAverage cost: £%.2f",
@@ -382,10 +588,8 @@ def main():
         str(gen_sum_costs),
     )
 
-    avg_gen_num_of_incidents = int(
-        sum(gen_nums_of_incidents) / len(gen_nums_of_incidents)
-    )
-    avg_gen_sum_costs = sum(gen_sum_costs) / len(gen_sum_costs)
+    avg_gen_num_of_incidents = int(np.mean(gen_nums_of_incidents))
+    avg_gen_sum_costs = float(np.mean(gen_sum_costs, dtype=np.float64))
     log.log(
         SUCCESS,
         "Results:\nAverage number of incidents: %d\nAverage cost: £%.2f",
@@ -408,10 +612,10 @@ def _label_plot(title="Untitled Plot", xlabel="x axis", ylabel="y axis") -> None
     plt.ylabel(ylabel)
 
 
-def _save_plot(filename="untitled") -> None:
-    """Save a plot and clear the figure."""
+def _save_plot(filename="untitled", always=False) -> None:
+    """Save a plot (if outputting images, or `always`) and clear the figure."""
 
-    if IMAGES:
+    if IMAGES or always:
         plt.savefig(OUTPUT_DIR + filename + ".png")
     plt.clf()
 
@@ -0,0 +1,34 @@
+"""
+    Optional Numba Support
+
+    This module re-exports the parts of Numba used by the other scripts, or
+    stand-ins for them if Numba is not installed, in which case JIT-decorated
+    functions run as plain Python.
+"""
+
+__all__ = [
+    "NUMBA_AVAILABLE",
+    "NUMBA_NUM_THREADS",
+    "njit",
+    "prange",
+    "set_num_threads",
+]
+
+try:
+    from numba import config, njit, prange, set_num_threads
+
+    NUMBA_AVAILABLE = True
+
+    # The most threads that Numba's parallel functions can be set to use.
+    NUMBA_NUM_THREADS = config.NUMBA_NUM_THREADS  # pylint: disable=no-member
+except ImportError:
+    NUMBA_AVAILABLE = False
+    NUMBA_NUM_THREADS = 1
+    prange = range  # pylint: disable=invalid-name
+
+    def njit(*_args, **_kwargs):
+        """Stand-in for `numba.njit` that leaves the function unchanged."""
+        return lambda func: func
+
+    def set_num_threads(_n):
+        """Stand-in for `numba.set_num_threads` that does nothing."""
@@ -14,15 +14,12 @@
 import os
 import sys
 import argparse
-import warnings
 import logging as log
 
-from typing import Tuple
+from typing import Tuple, Union
 
 import itertools
 import numpy as np
-import pandas as pd
-import statsmodels.formula.api as smf
 from matplotlib import pyplot as plt
 from scipy.stats import lognorm
 
@@ -56,11 +53,20 @@ BOUNDARIES = {
     "MAX": MAX_ANNUAL_INCIDENTS,
 }
 
+# The lower bounds of each of the boundaries, and the logs of their upper bounds
+# (i.e., of each boundary but the first), which the frequency distributions are
+# fitted against.
+_BOUNDARY_VALUES = np.fromiter(list(BOUNDARIES.values())[:-1], dtype=np.int64)
+_LOG_BOUNDARIES = np.log(np.array(list(BOUNDARIES.values())[1:], dtype=np.float64))
+
 OUTPUT_DIR = None
 IMAGES = None
 
 # pylint: disable=invalid-name,anomalous-backslash-in-string
-def _generate_new_incident_frequency_distribution(pairing: Tuple = (None, None)) -> int:
+def _generate_new_incident_frequency_distribution(
+    pairing: Tuple = (None, None),
+    incident_frequency_probabilities: Union[np.ndarray, None] = None,
+) -> int:
     """
     Generates a new incident frequency distribution.
 
@@ -68,8 +74,9 @@ def _generate_new_incident_frequency_distribution(pairing: Tuple = (None, None))
     -----
 
     (Re)generates the incident frequency distribution for a
-    :math:`\left(\text{size}, \text{industry}\right)` pairing from the data in
-    a Neo4j graph database.
+    :math:`\left(\text{size}, \text{industry}\right)` pairing from its
+    incident frequency probabilities, as looked up from the data in a Neo4j
+    graph database.
 
     Currently this only produces log-normal distributions. Additional types of
     distribution can be implemented by overloading this method (by importing the
@@ -81,11 +88,6 @@ def _generate_new_incident_frequency_distribution(pairing: Tuple = (None, None))
 
     log.info("Generating new incident frequency distribution for '%s'...", str(pairing))
 
-    # Attempts to get the incident probabilities for the pairing from the graph
-    # database
-    incident_frequency_probabilities = gi.get_incident_frequency_probabilities(
-        list(BOUNDARIES.values())[:-1], pairing
-    )
     if incident_frequency_probabilities is None:
         log.info(
             "No incident frequency distribution generated for '%s'.",
@@ -101,22 +103,19 @@ def _generate_new_incident_frequency_distribution(pairing: Tuple = (None, None))
     # If values are found, generate a distribution
     Fs = np.cumsum(incident_frequency_probabilities)
 
-    xs = np.log(list(BOUNDARIES.values())[1:])
+    xs = _LOG_BOUNDARIES
     ys = np.log(1 - Fs)
-    data = pd.DataFrame(xs, ys)
 
-    # pylint: disable=line-too-long
-    # See <https://www.statsmodels.org/stable/_modules/statsmodels/stats/stattools.html#omni_normtest> for explanation
-    # pylint: enable=line-too-long
-    with warnings.catch_warnings():
-        warnings.simplefilter("ignore")
-        fit = smf.ols(formula="ys ~ xs", data=data).fit()
-        log.debug(fit.summary())
+    # Fits a straight line to the log-log values by (ordinary) least squares
+    coeffs, *_ = np.linalg.lstsq(
+        np.column_stack([np.ones_like(xs), xs]), ys, rcond=None
+    )
+    log.debug("Fitted coefficients: %s", str(coeffs))
 
     # Get the parameters for the generated distribution and store them in the
     # graph database.
-    alogb = fit.params[0]
-    a = -fit.params[1]
+    alogb, slope = coeffs
+    a = -slope
     b = np.exp(alogb / a)
 
     gi.create_incident_frequency_distribution_node(pairing, a, b)
@@ -132,11 +131,15 @@ def _generate_new_incident_frequency_distribution(pairing: Tuple = (None, None))
 # pylint: enable=invalid-name
 
 # pylint: disable=anomalous-backslash-in-string
-def _generate_new_incident_costs_distribution(pairing: Tuple = (None, None)) -> int:
+def _generate_new_incident_costs_distribution(
+    pairing: Tuple = (None, None),
+    incident_cost_averages: Union[Tuple[float, float], None] = None,
+) -> int:
     """
     (Re)generates the incident cost distribution for a
-    :math:`\left(\text{size}, \text{industry}\right)` pairing from the data in
-    a Neo4j graph database.
+    :math:`\left(\text{size}, \text{industry}\right)` pairing from its mean
+    and median incident costs, as looked up from the data in a Neo4j graph
+    database.
 
     Currently this only produces log-normal distributions. Additional types of
     distribution can be implemented by overloading this method (by importing the
@@ -149,14 +152,15 @@ def _generate_new_incident_costs_distribution(pairing: Tuple = (None, None)) ->
     # Plots the distribution for the average cost of incident(s) over 12 months
     log.info("Generating new incident cost distribution for '%s'...", str(pairing))
 
-    incident_mean_cost, incident_median_cost = gi.get_incident_cost_averages(pairing)
-    if incident_mean_cost is None or incident_median_cost is None:
+    if incident_cost_averages is None or None in incident_cost_averages:
         log.info(
             "No incident costs distribution generated for '%s'.",
             str(pairing),
         )
         return 0
 
+    incident_mean_cost, incident_median_cost = incident_cost_averages
+
     log.debug(
         "Returned values are: mean = %s, median = %s",
         str(incident_mean_cost),
@@ -177,14 +181,11 @@ def _generate_new_incident_costs_distribution(pairing: Tuple = (None, None)) ->
         "Average annual incident-with-outcome cost distribution", "Cost (£)", "Density"
     )
     plt.plot(
-        [
-            lognorm.pdf(
-                np.log(i),
-                np.log(incident_mean_cost),
-                np.log(incident_median_cost) if incident_median_cost > 0 else 0,
-            )
-            for i in range(1, 2500)
-        ]
+        lognorm.pdf(
+            np.log(np.arange(1, 2500)),
+            np.log(incident_mean_cost),
+            np.log(incident_median_cost) if incident_median_cost > 0 else 0,
+        )
     )
     _save_plot("3 - cost dist")
 
@@ -201,7 +202,8 @@ def _generate_new_incident_costs_distribution(pairing: Tuple = (None, None)) ->
 def _generate_new_distributions(pairing: Tuple = (None, None)) -> Tuple:
     """(Re)generates the cost and likelihood distributions."""
 
-    gi.__init__()
+    gi.connect()
+    gi.create_schema()
 
     log.info("Existing distributions deleted: %s", bool(gi.delete_distributions()))
 
@@ -213,12 +215,22 @@ def _generate_new_distributions(pairing: Tuple = (None, None)) -> Tuple:
     industries = gi.get_industries() if pairing[1] is None else [pairing[1]]
 
     # Attempts to generate new distributions for every combination of size and
-    # industry values.
-    for pair in list(itertools.product(sizes, industries)):
+    # industry values, looking up the figures for all of them at once.
+    incident_frequency_probabilities = gi.get_all_incident_frequency_probabilities(
+        _BOUNDARY_VALUES, itertools.product(sizes, industries)
+    )
+    for pair, probabilities in incident_frequency_probabilities.items():
         successful_incidents_dists += _generate_new_incident_frequency_distribution(
-            pair
+            pair, probabilities
+        )
+
+    incident_cost_averages = gi.get_all_incident_cost_averages(
+        itertools.product(sizes, industries)
+    )
+    for pair, averages in incident_cost_averages.items():
+        successful_costs_dists += _generate_new_incident_costs_distribution(
+            pair, averages
         )
-        successful_costs_dists += _generate_new_incident_costs_distribution(pair)
 
     return successful_incidents_dists, successful_costs_dists
 